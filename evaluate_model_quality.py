@@ -7,8 +7,8 @@ Reports statistical similarity metrics and correlation preservation.
 import argparse
 import pandas as pd
 import numpy as np
-from inference import generate
-import joblib
+from inference import generate, get_model_info
+from joblib import Parallel, delayed
 
 
 def calculate_column_statistics(df, col):
@@ -27,6 +27,26 @@ def calculate_column_statistics(df, col):
     return stats
 
 
+def _score_categorical(real_col, syn_col):
+    """Score one categorical column; returns (score, report lines)."""
+    real_dist = real_col.value_counts(normalize=True)
+    syn_dist = syn_col.value_counts(normalize=True)
+    
+    # Calculate Total Variation Distance
+    r, s = real_dist.align(syn_dist, fill_value=0.0)
+    tvd = 0.5 * np.abs(r.values - s.values).sum()
+    
+    lines = [
+        f"  Total Variation Distance: {tvd:.4f}",
+        f"  Real categories: {len(real_dist)}, Synthetic: {len(syn_dist)}",
+        # Show top categories
+        f"  Top 3 Real: {dict(list(real_dist.head(3).items()))}",
+        f"  Top 3 Syn:  {dict(list(syn_dist.head(3).items()))}",
+    ]
+    
+    return 1.0 - tvd, lines
+
+
 def compare_distributions(real_df, synthetic_df):
     """Compare distributions between real and synthetic data."""
     print("\n" + "="*80)
@@ -35,50 +55,64 @@ def compare_distributions(real_df, synthetic_df):
     
     scores = []
     
+    # Numeric stats for all columns in one pass over 2-D arrays
+    # is_numeric_dtype (unlike select_dtypes(include=np.number)) also counts
+    # bool columns as numeric
+    num_cols = real_df.columns[real_df.dtypes.map(pd.api.types.is_numeric_dtype).to_numpy(dtype=bool)]
+    num_pos = {col: i for i, col in enumerate(num_cols)}
+    real_num = real_df[num_cols].to_numpy(dtype=np.float64)
+    syn_num = synthetic_df[num_cols].to_numpy(dtype=np.float64)
+    
+    real_mean = np.nanmean(real_num, axis=0)
+    syn_mean = np.nanmean(syn_num, axis=0)
+    real_std = np.nanstd(real_num, axis=0, ddof=1)
+    syn_std = np.nanstd(syn_num, axis=0, ddof=1)
+    
+    mean_diff = np.abs(real_mean - syn_mean) / (np.abs(real_mean) + 1e-10)
+    std_diff = np.abs(real_std - syn_std) / (np.abs(real_std) + 1e-10)
+    
+    # Score: higher is better (max 1.0)
+    num_scores = 1.0 - np.minimum(1.0, (mean_diff + std_diff) / 2)
+    
+    # Categorical columns are independent, so score them on a thread pool
+    # and print the results in column order afterwards
+    cat_cols = [col for col in real_df.columns if col not in num_pos]
+    cat_results = dict(zip(cat_cols, Parallel(n_jobs=-1, prefer='threads')(
+        delayed(_score_categorical)(real_df[col], synthetic_df[col]) for col in cat_cols
+    )))
+    
     for col in real_df.columns:
         print(f"\n{col}:")
         
-        if pd.api.types.is_numeric_dtype(real_df[col]):
-            real_mean = real_df[col].mean()
-            syn_mean = synthetic_df[col].mean()
-            real_std = real_df[col].std()
-            syn_std = synthetic_df[col].std()
+        if col in num_pos:
+            i = num_pos[col]
+            print(f"  Mean:   Real={real_mean[i]:.4f}, Synthetic={syn_mean[i]:.4f}, Diff={mean_diff[i]:.4%}")
+            print(f"  Std:    Real={real_std[i]:.4f}, Synthetic={syn_std[i]:.4f}, Diff={std_diff[i]:.4%}")
             
-            mean_diff = abs(real_mean - syn_mean) / (abs(real_mean) + 1e-10)
-            std_diff = abs(real_std - syn_std) / (abs(real_std) + 1e-10)
-            
-            print(f"  Mean:   Real={real_mean:.4f}, Synthetic={syn_mean:.4f}, Diff={mean_diff:.4%}")
-            print(f"  Std:    Real={real_std:.4f}, Synthetic={syn_std:.4f}, Diff={std_diff:.4%}")
-            
-            # Score: higher is better (max 1.0)
-            score = 1.0 - min(1.0, (mean_diff + std_diff) / 2)
+            score = num_scores[i]
             scores.append(score)
             print(f"  Similarity Score: {score:.2%}")
             
         else:
-            # Categorical
-            real_dist = real_df[col].value_counts(normalize=True)
-            syn_dist = synthetic_df[col].value_counts(normalize=True)
-            
-            # Calculate Total Variation Distance
-            all_categories = set(real_dist.index) | set(syn_dist.index)
-            tvd = sum(abs(real_dist.get(cat, 0) - syn_dist.get(cat, 0)) 
-                     for cat in all_categories) / 2
-            
-            print(f"  Total Variation Distance: {tvd:.4f}")
-            print(f"  Real categories: {len(real_dist)}, Synthetic: {len(syn_dist)}")
+            score, lines = cat_results[col]
+            for line in lines:
+                print(line)
             
-            # Show top categories
-            print(f"  Top 3 Real: {dict(list(real_dist.head(3).items()))}")
-            print(f"  Top 3 Syn:  {dict(list(syn_dist.head(3).items()))}")
-            
-            score = 1.0 - tvd
             scores.append(score)
             print(f"  Similarity Score: {score:.2%}")
     
     return scores
 
 
+def _corr_matrix(df):
+    """Pearson correlation matrix of a numeric DataFrame as an ndarray."""
+    values = df.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        # np.corrcoef has no pairwise NaN handling, so defer to pandas
+        return df.corr().to_numpy()
+    return np.corrcoef(values, rowvar=False)
+
+
 def compare_correlations(real_df, synthetic_df):
     """Compare correlation matrices between real and synthetic data."""
     print("\n" + "="*80)
@@ -92,12 +126,13 @@ def compare_correlations(real_df, synthetic_df):
         print("  Not enough numeric columns to compute correlations")
         return None
     
-    real_corr = real_df[numeric_cols].corr()
-    syn_corr = synthetic_df[numeric_cols].corr()
+    real_corr_m = _corr_matrix(real_df[numeric_cols])
+    syn_corr_m = _corr_matrix(synthetic_df[numeric_cols])
     
     # Flatten and compare
-    real_corr_flat = real_corr.values[np.triu_indices_from(real_corr.values, k=1)]
-    syn_corr_flat = syn_corr.values[np.triu_indices_from(syn_corr.values, k=1)]
+    upper = np.triu_indices(len(numeric_cols), k=1)
+    real_corr_flat = real_corr_m[upper]
+    syn_corr_flat = syn_corr_m[upper]
     
     # Calculate correlation of correlations
     mae = np.mean(np.abs(real_corr_flat - syn_corr_flat))
@@ -116,6 +151,8 @@ def compare_correlations(real_df, synthetic_df):
     print(f"  Correlation Preservation Score: {corr_of_corr:.2%}")
     
     # Show some examples
+    real_corr = pd.DataFrame(real_corr_m, index=numeric_cols, columns=numeric_cols)
+    syn_corr = pd.DataFrame(syn_corr_m, index=numeric_cols, columns=numeric_cols)
     print(f"\n  Example correlations:")
     for i in range(min(3, len(numeric_cols)-1)):
         for j in range(i+1, min(i+2, len(numeric_cols))):
@@ -166,11 +203,11 @@ def main():
     real_df = pd.read_csv(args.data, encoding='utf-8-sig')
     print(f"  Shape: {real_df.shape}")
     
-    # Load model info
-    model_data = joblib.load(args.model)
+    # Load model info (cached and memory-mapped; generate() reuses it)
+    model_info = get_model_info(args.model)
     print(f"\nModel Information:")
-    print(f"  Library: {model_data['library']}")
-    print(f"  Columns: {len(model_data['columns'])}")
+    print(f"  Library: {model_info['library']}")
+    print(f"  Columns: {len(model_info['columns'])}")
     
     # Generate synthetic data
     n_samples = args.n if args.n is not None else len(real_df)
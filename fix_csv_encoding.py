@@ -4,10 +4,159 @@ Fix CSV encoding issues for Windows compatibility.
 This script converts CSV files to UTF-8 with BOM, which works reliably on Windows.
 """
 
+import io
 import sys
+import codecs
 import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+
+ENCODINGS_TO_TRY = ['utf-8-sig', 'utf-8', 'latin1', 'cp1252', 'iso-8859-1']
+
+# Number of leading bytes inspected when sniffing the encoding
+SNIFF_BYTES = 64 * 1024
+
+
+def detect_encoding(sample: bytes) -> Optional[str]:
+    """
+    Guess the encoding of CSV data from a leading sample of its bytes.
+    
+    Returns None when charset_normalizer is not installed or cannot decide.
+    ASCII and UTF-8 are reported as 'utf-8-sig', which reads both and drops
+    a leading BOM.
+    """
+    if charset_normalizer is None:
+        return None
+    
+    match = charset_normalizer.from_bytes(sample[:SNIFF_BYTES]).best()
+    if match is None:
+        return None
+    
+    if codecs.lookup(match.encoding).name in ('ascii', 'utf-8'):
+        return 'utf-8-sig'
+    return match.encoding
+
+
+def is_single_byte_encoding(encoding: str) -> bool:
+    """Return True if every byte decodes to exactly one character on its own."""
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    return all(len(decoder.decode(bytes([b]))) == 1 for b in range(256))
+
+
+def candidate_encodings(sample: bytes) -> list:
+    """
+    Encodings to try when reading CSV data, most likely first.
+    
+    Strict UTF-8 always goes first. A sniffed single-byte encoding is tried
+    next, ahead of the fixed fallbacks. Sniffed multibyte guesses (e.g. big5
+    for short latin1 files) are ignored: they can decode without error while
+    swallowing the ASCII bytes around each non-ASCII one.
+    """
+    candidates = list(ENCODINGS_TO_TRY)
+    detected = detect_encoding(sample)
+    if detected is not None and is_single_byte_encoding(detected):
+        detected_name = codecs.lookup(detected).name
+        candidates = candidates[:1] + [detected] + [
+            enc for enc in candidates[1:] if codecs.lookup(enc).name != detected_name
+        ]
+    return candidates
+
+
+def _temporal_columns(data: bytes) -> list:
+    """Columns pyarrow infers as timestamps, dates or times, judged from the first block."""
+    schema = pacsv.open_csv(io.BytesIO(data)).schema
+    return [field.name for field in schema if pa.types.is_temporal(field.type)]
+
+
+def read_csv_fast(source, encoding: str) -> pd.DataFrame:
+    """
+    Read a CSV with pandas' multi-threaded pyarrow parser.
+    
+    The data is decoded strictly up front, because the pyarrow engine
+    doesn't raise on invalid bytes (it returns them as `bytes` cells).
+    Parsing falls back to the default C parser when pyarrow is not
+    installed or cannot handle the file, and for files with date or time
+    columns, which pyarrow would turn into datetimes (ISO timestamps
+    converted to UTC) instead of leaving them as text. Decoding errors are
+    raised as-is so callers can move on to the next encoding.
+    
+    Args:
+        source: Path to the CSV file, or its raw bytes
+        encoding: Text encoding of the file
+    """
+    if isinstance(source, bytes):
+        data = source
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    
+    if has_non_ascii(data):
+        # Re-encode as plain UTF-8; this also drops a utf-8-sig BOM
+        data = data.decode(encoding).encode('utf-8')
+    
+    if pa is not None:
+        try:
+            if not _temporal_columns(data):
+                return pd.read_csv(io.BytesIO(data), encoding='utf-8', engine='pyarrow')
+        except ValueError:
+            pass
+    return pd.read_csv(io.BytesIO(data), encoding='utf-8')
+
+
+def to_arrow_table(df: pd.DataFrame):
+    """
+    Convert df to a pyarrow Table for pyarrow's CSV writer.
+    
+    Returns None when pyarrow is not installed or cannot represent one of
+    the columns, in which case callers fall back to pandas' to_csv.
+    """
+    if pa is None:
+        return None
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+
+def has_non_ascii(data: bytes) -> bool:
+    """Return True if any byte in `data` is outside the 7-bit ASCII range."""
+    return bool((np.frombuffer(data, dtype=np.uint8) > 127).any())
+
+
+def clean_ascii_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Strip non-ASCII characters from every string column, in place.
+    
+    Missing values and cells that end up empty are replaced with 'Unknown'.
+    Each column goes through pandas' vectorized string methods rather than
+    a Python call per cell, and the ASCII round trip is skipped entirely for
+    columns that are already pure ASCII.
+    
+    Args:
+        df: DataFrame to clean (modified in place)
+    
+    Returns:
+        The same DataFrame, for convenience
+    """
+    for col in df.select_dtypes(include='object').columns:
+        values = df[col].fillna('').astype(str)
+        if has_non_ascii(''.join(values).encode('utf-8')):
+            values = values.str.encode('ascii', 'ignore').str.decode('ascii')
+        df[col] = values.str.strip().replace('', 'Unknown')
+    return df
 
 
 def fix_csv_encoding(input_path: str, output_path: str = None):
@@ -23,14 +172,15 @@ def fix_csv_encoding(input_path: str, output_path: str = None):
     
     print(f"Reading {input_path}...")
     
-    # Try different encodings
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'latin1', 'cp1252', 'iso-8859-1']
+    # Try the sniffed encoding first, then the common fallbacks
+    with open(input_path, 'rb') as f:
+        encodings_to_try = candidate_encodings(f.read(SNIFF_BYTES))
     df = None
     encoding_used = None
     
     for encoding in encodings_to_try:
         try:
-            df = pd.read_csv(input_path, encoding=encoding)
+            df = read_csv_fast(input_path, encoding)
             encoding_used = encoding
             print(f"  [OK] Successfully read with encoding: {encoding}")
             break
@@ -47,13 +197,7 @@ def fix_csv_encoding(input_path: str, output_path: str = None):
     print(f"  Loaded: {len(df)} rows, {len(df.columns)} columns")
     
     # Clean string columns for Windows compatibility
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].fillna('').astype(str)
-            # Convert to ASCII, removing non-ASCII characters
-            df[col] = df[col].apply(lambda x: x.encode('ascii', 'ignore').decode('ascii') if isinstance(x, str) else str(x))
-            df[col] = df[col].str.strip()
-            df[col] = df[col].replace('', 'Unknown')
+    clean_ascii_columns(df)
     
     # Save with UTF-8-sig (includes BOM for Windows compatibility)
     print(f"Writing to {output_path} with UTF-8-sig encoding...")
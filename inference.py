@@ -1,29 +1,89 @@
 #!/usr/bin/env python3
 
+import inspect
+import os
 import joblib
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Callable, Optional
+from model_io import MMAP_MODE
 
-_model_cache = None
 
-
-def load_model(model_path: str = "ctgan_model.joblib") -> dict:
-    global _model_cache
+def _make_sampler(model_data: dict) -> Callable[[int, Optional[int]], pd.DataFrame]:
+    # Resolve library-specific sampling once at load time so generate()
+    # doesn't branch (or probe SDV with a TypeError) on every call
+    model = model_data['model']
+    library = model_data['library']
     
-    if _model_cache is None:
-        print(f"Loading model from {model_path}...")
-        try:
-            _model_cache = joblib.load(model_path)
-            print(f"[OK] Model loaded successfully (library: {_model_cache['library']})")
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"Model file '{model_path}' not found. "
-                "Please run train_and_save_ctgan.py first."
-            )
-        except Exception as e:
-            raise Exception(f"Failed to load model: {e}")
+    if library == 'sdv':
+        if 'random_state' in inspect.signature(model.sample).parameters:
+            return lambda n, seed: model.sample(num_rows=n, random_state=seed)
+        
+        def sample_sdv(n, seed):
+            if seed is not None:
+                print(f"Warning: random_state not supported by this SDV version")
+            return model.sample(num_rows=n)
+        return sample_sdv
+    
+    if library == 'simple-statistical':
+        return lambda n, seed: model.sample(n, seed=seed)
     
-    return _model_cache
+    # ctgan
+    def sample_ctgan(n, seed):
+        if seed is not None:
+            np.random.seed(seed)
+        return model.sample(n)
+    return sample_ctgan
+
+
+# One (mtime, model dict) entry per path, so repeated generate() calls
+# reuse the unpickled model while a retrained file replaces the old entry
+# instead of piling up next to it
+_model_cache = {}
+
+
+def _load_model_file(model_path: str) -> dict:
+    print(f"Loading model from {model_path}...")
+    # Memory-map numpy arrays stored in the pickle instead of reading
+    # them into RAM (except on Windows, see model_io); joblib falls back
+    # to a normal load for compressed dumps
+    model_data = joblib.load(model_path, mmap_mode=MMAP_MODE)
+    model_data['sampler'] = _make_sampler(model_data)
+    model_data['_info'] = {
+        'library': model_data.get('library', 'unknown'),
+        'columns': model_data.get('columns', []),
+        'categorical_columns': model_data.get('categorical_columns', [])
+    }
+    print(f"[OK] Model loaded successfully (library: {model_data['library']})")
+    return model_data
+
+
+def load_model(model_path: str = "ctgan_model.joblib") -> dict:
+    try:
+        mtime = os.path.getmtime(model_path)
+        cached = _model_cache.get(model_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        
+        # Drop the stale model before loading its replacement
+        _model_cache.pop(model_path, None)
+        model_data = _load_model_file(model_path)
+        _model_cache[model_path] = (mtime, model_data)
+        return model_data
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"Model file '{model_path}' not found. "
+            "Please run train_and_save_ctgan.py first."
+        )
+    except Exception as e:
+        raise Exception(f"Failed to load model: {e}")
+
+
+def refresh_model(model_path: str = "ctgan_model.joblib") -> dict:
+    # Drop the cached model so a freshly trained file is picked up even if
+    # its mtime didn't change (coarse filesystem timestamps)
+    _model_cache.pop(model_path, None)
+    return load_model(model_path)
 
 
 def generate(n: int = 1000, seed: Optional[int] = None, model_path: str = "ctgan_model.joblib") -> pd.DataFrame:
@@ -31,28 +91,11 @@ def generate(n: int = 1000, seed: Optional[int] = None, model_path: str = "ctgan
         raise ValueError(f"Number of samples must be positive, got {n}")
     
     model_data = load_model(model_path)
-    model = model_data['model']
-    library = model_data['library']
     
     print(f"Generating {n} synthetic samples...")
     
     try:
-        if library == 'sdv':
-            try:
-                synthetic_df = model.sample(num_rows=n, random_state=seed)
-            except TypeError:
-                if seed is not None:
-                    print(f"Warning: random_state not supported by this SDV version")
-                synthetic_df = model.sample(num_rows=n)
-        
-        elif library == 'simple-statistical':
-            synthetic_df = model.sample(n, seed=seed)
-        
-        else:  # ctgan
-            if seed is not None:
-                import numpy as np
-                np.random.seed(seed)
-            synthetic_df = model.sample(n)
+        synthetic_df = model_data['sampler'](n, seed)
         
         print(f"[OK] Generated {len(synthetic_df)} rows")
         return synthetic_df
@@ -62,13 +105,8 @@ def generate(n: int = 1000, seed: Optional[int] = None, model_path: str = "ctgan
 
 
 def get_model_info(model_path: str = "ctgan_model.joblib") -> dict:
-    model_data = load_model(model_path)
-    
-    return {
-        'library': model_data.get('library', 'unknown'),
-        'columns': model_data.get('columns', []),
-        'categorical_columns': model_data.get('categorical_columns', [])
-    }
+    # Built once in load_model; health checks hit this on every probe
+    return load_model(model_path)['_info']
 
 
 if __name__ == '__main__':
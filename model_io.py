@@ -0,0 +1,32 @@
+"""
+Saving trained models in the format inference.load_model() expects.
+"""
+
+import os
+import tempfile
+import joblib
+
+# Windows can't replace a file while a memory map of it is open, which
+# would make save_model() fail whenever the server has the model loaded
+MMAP_MODE = None if os.name == 'nt' else 'r'
+
+
+def save_model(model_data: dict, model_path: str = "ctgan_model.joblib", protocol: int = 4):
+    """
+    Save a model dict to `model_path` without touching the existing file.
+    
+    Loaded models memory-map their file, so it is never overwritten in
+    place: the dump goes to a temporary file in the same directory, which
+    is then swapped in. Readers holding the old mapping keep the old
+    (unlinked) file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(model_path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        # Uncompressed so load_model() can memory-map it
+        joblib.dump(model_data, tmp_path, protocol=protocol, compress=0)
+        os.replace(tmp_path, model_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
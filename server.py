@@ -4,13 +4,16 @@ from fastapi import FastAPI, HTTPException, Query, UploadFile, File, BackgroundT
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
 import io
-import os
+import codecs
 import traceback
 from datetime import datetime
 import pandas as pd
-import subprocess
 import sys
-from inference import generate, get_model_info
+import threading
+import inference
+from inference import generate, get_model_info, load_model
+from fix_csv_encoding import candidate_encodings, has_non_ascii, to_arrow_table
+from train_and_save_ctgan import train
 
 # Check if CTGAN is available
 try:
@@ -48,6 +51,15 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def load_model_on_startup():
+    # Load once per process so the first /generate doesn't pay for unpickling
+    try:
+        load_model()
+    except Exception as e:
+        print(f"[WARNING] Model not loaded at startup: {e}")
+
+
 training_status = {
     "is_training": False,
     "progress": 0,
@@ -116,6 +128,54 @@ async def model_info():
         }
 
 
+CSV_CHUNK_ROWS = 5000
+
+
+def _iter_csv(df: pd.DataFrame, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Return an iterator over a DataFrame rendered as CSV, header first, then
+    chunk_rows rows at a time.
+    
+    Uses pyarrow's CSV writer when the frame converts to an Arrow table and
+    pandas' to_csv otherwise. The conversion happens here, before the
+    response starts, so a failure can still fall back.
+    """
+    table = to_arrow_table(df)
+    if table is not None:
+        return _iter_arrow_csv(table, chunk_rows)
+    return _iter_pandas_csv(df, chunk_rows)
+
+
+def _arrow_csv_bytes(table, include_header: bool) -> bytes:
+    # Only reached with a table from to_arrow_table, so pyarrow is installed
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(include_header=include_header))
+    return sink.getvalue().to_pybytes()
+
+
+def _iter_arrow_csv(table, chunk_rows: int):
+    yield _arrow_csv_bytes(table.slice(0, 0), include_header=True)
+    
+    # Table slices are zero-copy views
+    for start in range(0, table.num_rows, chunk_rows):
+        yield _arrow_csv_bytes(table.slice(start, chunk_rows), include_header=False)
+
+
+def _iter_pandas_csv(df: pd.DataFrame, chunk_rows: int):
+    buf = io.StringIO()
+    df.head(0).to_csv(buf, index=False)
+    yield buf.getvalue()
+    
+    for start in range(0, len(df), chunk_rows):
+        buf.seek(0)
+        buf.truncate()
+        df.iloc[start:start + chunk_rows].to_csv(buf, index=False, header=False)
+        yield buf.getvalue()
+
+
 @app.post("/generate")
 async def generate_synthetic_data(
     n: int = Query(
@@ -133,15 +193,11 @@ async def generate_synthetic_data(
         print(f"Generating {n} samples (seed: {seed})...")
         synthetic_df = generate(n=n, seed=seed)
         
-        csv_buffer = io.StringIO()
-        synthetic_df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
-        csv_string = csv_buffer.getvalue()
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"synthetic_data_{n}rows_{timestamp}.csv"
         
         return StreamingResponse(
-            iter([csv_string]),
+            _iter_csv(synthetic_df),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
@@ -169,44 +225,58 @@ async def generate_synthetic_data(
         )
 
 
+# Trainings run in worker threads and all write ctgan_model.joblib, so only
+# one may run at a time. This also keeps the process-wide warning filters
+# that train() swaps while fitting (warnings.catch_warnings isn't
+# thread-safe) from being restored out of order by a second training.
+_training_lock = threading.Lock()
+
+
 def train_model_background(file_path: str, epochs: int):
+    with _training_lock:
+        _train_model_background(file_path, epochs)
+
+
+def _train_model_background(file_path: str, epochs: int):
     global training_status
     try:
         training_status["is_training"] = True
         training_status["message"] = f"Training started with {epochs} epochs..."
         training_status["total_epochs"] = epochs
+        training_status["current_epoch"] = 0
         training_status["progress"] = 0
         
         print(f"Starting training: {file_path}, epochs: {epochs}")
         
-        result = subprocess.run(
-            [sys.executable, "train_and_save_ctgan.py", "--data", file_path, "--epochs", str(epochs)],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(os.path.abspath(__file__))
-        )
+        def on_progress(epoch):
+            training_status["current_epoch"] = epoch
+            training_status["progress"] = int(100 * epoch / epochs)
         
-        print(f"Training subprocess completed with return code: {result.returncode}")
-        print(f"STDOUT: {result.stdout}")
-        print(f"STDERR: {result.stderr}")
+        # Train in this worker thread; BackgroundTasks already runs it off
+        # the event loop, and the heavy imports are only paid once
+        train(data_path=file_path, epochs=epochs, progress_cb=on_progress)
+        
+        inference.refresh_model("ctgan_model.joblib")
+        
+        training_status["is_training"] = False
+        training_status["progress"] = 100
+        training_status["message"] = "Training completed successfully!"
         
-        if result.returncode == 0:
-            training_status["is_training"] = False
-            training_status["progress"] = 100
-            training_status["message"] = "Training completed successfully!"
-            
-            if os.path.exists("inference.py"):
-                import importlib
-                import inference
-                importlib.reload(inference)
-        else:
-            training_status["is_training"] = False
-            error_msg = result.stderr or result.stdout or "Unknown error"
-            training_status["message"] = f"Training failed: {error_msg}"
-            
     except Exception as e:
+        print("Training failed:")
+        traceback.print_exc()
+        
         training_status["is_training"] = False
-        training_status["message"] = f"Training error: {str(e)}"
+        training_status["message"] = f"Training failed: {str(e)}"
+
+
+def _count_csv_rows(data: bytes) -> int:
+    # Line count minus the header; quoted fields spanning lines are
+    # counted more than once, which is fine for reporting
+    lines = data.count(b'\n')
+    if data and not data.endswith(b'\n'):
+        lines += 1
+    return max(lines - 1, 0)
 
 
 @app.post("/upload-train")
@@ -231,49 +301,57 @@ async def upload_and_train(
     
     try:
         contents = await file.read()
-        # Try multiple encodings to read the uploaded file
-        df = None
-        for encoding in ['utf-8-sig', 'utf-8', 'latin1', 'cp1252', 'iso-8859-1']:
-            try:
-                df = pd.read_csv(io.BytesIO(contents), encoding=encoding)
-                break
-            except (UnicodeDecodeError, UnicodeError):
-                continue
         
-        if df is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Unable to read CSV file. Please ensure it's a valid CSV with UTF-8 encoding."
-            )
+        if not has_non_ascii(contents):
+            # Already ASCII-clean (and BOM-free): nothing to decode or strip
+            cleaned = contents
+        else:
+            # Try the sniffed encoding first, then the common fallbacks
+            text = None
+            for encoding in candidate_encodings(contents):
+                try:
+                    text = contents.decode(encoding)
+                    break
+                except (UnicodeDecodeError, UnicodeError):
+                    continue
+            
+            if text is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Unable to read CSV file. Please ensure it's a valid CSV with UTF-8 encoding."
+                )
+            
+            # Strip non-ASCII characters at the byte level for Windows
+            # compatibility; the training script does the per-cell cleanup
+            cleaned = text.encode('ascii', errors='ignore')
         
-        if len(df) < 5:
+        # Only parse enough rows to validate the upload
+        preview = pd.read_csv(io.BytesIO(cleaned), nrows=5)
+        if len(preview) < 5:
             raise HTTPException(
                 status_code=400,
                 detail="Dataset must have at least 5 rows"
             )
         
-        # Clean string data for Windows compatibility
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                df[col] = df[col].fillna('').astype(str)
-                df[col] = df[col].apply(lambda x: x.encode('ascii', 'ignore').decode('ascii') if isinstance(x, str) else str(x))
-                df[col] = df[col].str.strip()
-                df[col] = df[col].replace('', 'Unknown')
-        
         # Save with UTF-8-sig encoding for Windows compatibility
         upload_path = f"uploaded_data.csv"
-        df.to_csv(upload_path, index=False, encoding='utf-8-sig')
+        with open(upload_path, 'wb') as f:
+            f.write(codecs.BOM_UTF8)
+            f.write(cleaned)
         
         background_tasks.add_task(train_model_background, upload_path, epochs)
         
+        rows = _count_csv_rows(cleaned)
         return {
             "success": True,
-            "message": f"Training started with {len(df)} rows, {len(df.columns)} columns",
-            "rows": len(df),
-            "columns": list(df.columns),
+            "message": f"Training started with {rows} rows, {len(preview.columns)} columns",
+            "rows": rows,
+            "columns": list(preview.columns),
             "epochs": epochs
         }
         
+    except HTTPException:
+        raise
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="CSV file is empty")
     except Exception as e:
@@ -293,8 +371,17 @@ async def custom_docs():
 
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
     
+    parser = argparse.ArgumentParser(description='CTGAN Synthetic Data API server')
+    parser.add_argument(
+        '--dev',
+        action='store_true',
+        help='Reload the server on code changes (development only)'
+    )
+    args = parser.parse_args()
+    
     print("\nStarting CTGAN Synthetic Data API Server...")
     print("   Server will run at: http://localhost:8000")
     print("   API docs at: http://localhost:8000/docs")
@@ -305,6 +392,6 @@ if __name__ == "__main__":
         "server:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=args.dev,
         log_level="info"
     )
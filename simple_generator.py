@@ -7,8 +7,69 @@ Uses pandas and numpy to generate data based on statistical distributions.
 
 import pandas as pd
 import numpy as np
-import joblib
+from joblib import Parallel, delayed
 from typing import Optional
+from fix_csv_encoding import clean_ascii_columns
+from model_io import save_model
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _cdf(probabilities) -> np.ndarray:
+    """Cumulative distribution of category probabilities, ending at exactly 1."""
+    cdf = np.cumsum(np.asarray(probabilities, dtype=np.float64))
+    cdf /= cdf[-1]
+    # Uniform draws are < 1, so searchsorted never runs past the last category
+    cdf[-1] = 1.0
+    return cdf
+
+
+def _fit_categorical(series: pd.Series) -> dict:
+    """Stats for one categorical column: its values and their probabilities."""
+    codes, uniques = pd.factorize(series)
+    # Missing values get code -1 and, as with value_counts, are left out
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return {
+        'type': 'categorical',
+        'values': np.asarray(uniques),
+        'probabilities': (counts / counts.sum()).astype(np.float32)
+    }
+
+
+def _cat_sample_numpy(cdf_flat, starts, ends, U):
+    """Category index for each uniform in U (n, n_cat) against the shifted CDFs."""
+    idx = np.searchsorted(cdf_flat, U + np.arange(U.shape[1]), side='right')
+    # j + u can round up to j + 1 for u close to 1; keep it in column j
+    np.minimum(idx, ends, out=idx)
+    idx -= starts
+    return idx
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def _cat_sample_numba(cdf_flat, starts, ends, U, out):
+        # Same result as _cat_sample_numpy, but each draw is binary-searched
+        # only within its own column and written straight into `out`.
+        # Deliberately serial: a parallel=True kernel first called from a
+        # server worker thread leaves numba's thread pool hanging the
+        # process at exit.
+        n, n_cat = U.shape
+        for i in range(n):
+            for j in range(n_cat):
+                x = U[i, j] + j
+                lo = starts[j]
+                hi = ends[j]
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if cdf_flat[mid] > x:
+                        hi = mid
+                    else:
+                        lo = mid + 1
+                out[i, j] = lo - starts[j]
 
 
 class SimpleGenerator:
@@ -24,54 +85,144 @@ class SimpleGenerator:
         self.columns = list(df.columns)
         self.categorical_columns = categorical_columns or []
         
+        # For numerical: mean, std, min, max as whole-frame reductions
+        num_df = df.select_dtypes(exclude='object').drop(columns=self.categorical_columns, errors='ignore')
+        num_stats = pd.DataFrame({
+            'mean': num_df.mean(),
+            'std': num_df.std(),
+            'min': num_df.min(),
+            'max': num_df.max()
+        })
+        
+        # For categorical: value counts per column, independent of each other,
+        # so run them on a thread pool
+        cat_cols = [col for col in df.columns if col not in num_stats.index]
+        cat_stats = dict(zip(cat_cols, Parallel(n_jobs=-1, prefer='threads')(
+            delayed(_fit_categorical)(df[col]) for col in cat_cols
+        )))
+        
         for col in df.columns:
-            if col in self.categorical_columns or df[col].dtype == 'object':
-                # For categorical: store value counts (probabilities)
-                value_counts = df[col].value_counts(normalize=True)
-                self.stats[col] = {
-                    'type': 'categorical',
-                    'values': list(value_counts.index),
-                    'probabilities': list(value_counts.values)
-                }
-            else:
-                # For numerical: store mean, std, min, max
+            if col in num_stats.index:
                 self.stats[col] = {
                     'type': 'numerical',
-                    'mean': float(df[col].mean()),
-                    'std': float(df[col].std()),
-                    'min': float(df[col].min()),
-                    'max': float(df[col].max())
+                    'mean': float(num_stats.at[col, 'mean']),
+                    'std': float(num_stats.at[col, 'std']),
+                    'min': float(num_stats.at[col, 'min']),
+                    'max': float(num_stats.at[col, 'max'])
                 }
+            else:
+                self.stats[col] = cat_stats[col]
+        
+        self._build_arrays()
     
-    def sample(self, n: int, seed: Optional[int] = None) -> pd.DataFrame:
-        """Generate n synthetic samples."""
-        if seed is not None:
-            np.random.seed(seed)
+    def _build_arrays(self):
+        """Pack per-column stats into the flat arrays used by sample()."""
+        self._num_cols = [col for col in self.columns if self.stats[col]['type'] == 'numerical']
+        num_stats = [self.stats[col] for col in self._num_cols]
+        # float64: float32 can't resolve large-magnitude columns with a
+        # small spread (e.g. Unix timestamps are 128 apart near 1.7e9)
+        self._num_means = np.array([s['mean'] for s in num_stats], dtype=np.float64)
+        self._num_stds = np.array([s['std'] for s in num_stats], dtype=np.float64)
+        self._num_min = np.array([s['min'] for s in num_stats], dtype=np.float64)
+        self._num_max = np.array([s['max'] for s in num_stats], dtype=np.float64)
         
-        synthetic_data = {}
+        self._cat_cols = [col for col in self.columns if self.stats[col]['type'] == 'categorical']
+        self._cat_values = [np.asarray(self.stats[col]['values']) for col in self._cat_cols]
         
-        for col in self.columns:
-            col_stats = self.stats[col]
-            
-            if col_stats['type'] == 'categorical':
-                # Sample from categorical distribution
-                synthetic_data[col] = np.random.choice(
-                    col_stats['values'],
-                    size=n,
-                    p=col_stats['probabilities']
-                )
+        # Column j's CDF is shifted into (j, j + 1] and all of them are
+        # concatenated, so a single searchsorted covers every column. This
+        # stays float64: with the shift, float32 would lose resolution in
+        # the probabilities as the column count grows.
+        cdfs = [_cdf(self.stats[col]['probabilities']) + j for j, col in enumerate(self._cat_cols)]
+        sizes = np.array([len(cdf) for cdf in cdfs], dtype=np.int64)
+        self._cat_cdf_flat = np.concatenate(cdfs) if cdfs else np.empty(0)
+        self._cat_ends = np.cumsum(sizes) - 1
+        self._cat_starts = self._cat_ends - sizes + 1
+        # Smallest signed integer type that can index every column's values,
+        # so sampled codes take 1-2 bytes per cell instead of 8
+        self._cat_code_dtype = np.min_scalar_type(-int(sizes.max(initial=1)))
+    
+    def __setstate__(self, state):
+        # Models pickled by older versions lack some or all of the packed
+        # arrays, or hold the numeric ones as float32; rebuild them from `stats`
+        self.__dict__.update(state)
+        if '_cat_code_dtype' not in state or self._num_means.dtype != np.float64:
+            self._build_arrays()
+    
+    def _sample_numerics(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """All numerical columns at once: normal draws, clipped to observed range."""
+        # Draw straight into the output buffer and transform it in place,
+        # so no intermediate arrays are allocated
+        num_out = np.empty((n, len(self._num_cols)), dtype=np.float64)
+        rng.standard_normal(out=num_out)
+        num_out *= self._num_stds
+        num_out += self._num_means
+        np.maximum(num_out, self._num_min, out=num_out)
+        np.minimum(num_out, self._num_max, out=num_out)
+        return num_out
+    
+    def _sample_categoricals(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Category codes for all categorical columns, by inverting the CDFs in one pass."""
+        # Codes go into one preallocated buffer, column-major so each
+        # column's codes are contiguous
+        n_cat = len(self._cat_cols)
+        codes = np.empty((n, n_cat), dtype=self._cat_code_dtype, order='F')
+        if n_cat:
+            U = rng.random((n, n_cat))
+            if NUMBA_AVAILABLE:
+                _cat_sample_numba(self._cat_cdf_flat, self._cat_starts, self._cat_ends, U, codes)
             else:
-                # Sample from normal distribution, clipped to min/max
-                samples = np.random.normal(
-                    col_stats['mean'],
-                    col_stats['std'],
-                    size=n
-                )
-                # Clip to observed range
-                samples = np.clip(samples, col_stats['min'], col_stats['max'])
-                synthetic_data[col] = samples
+                codes[...] = _cat_sample_numpy(self._cat_cdf_flat, self._cat_starts, self._cat_ends, U)
+        return codes
+    
+    def sample(self, n: int, seed: Optional[int] = None, as_array: bool = False,
+               as_category: bool = False):
+        """
+        Generate n synthetic samples.
+        
+        Returns a DataFrame, or with `as_array=True` a `(num_out, cat_codes)`
+        tuple: an (n, n_num) float64 array ordered like `_num_cols` and an
+        (n, n_cat) array of indices into each column's `stats[col]['values']`,
+        ordered like `_cat_cols`. With `as_category=True` categorical columns
+        come back as pandas Categoricals built on those codes instead of
+        being expanded into their labels.
+        """
+        # SFC64 is the fastest of numpy's bit generators; a fresh Generator
+        # per call keeps sampling free of shared global state
+        rng = np.random.Generator(np.random.SFC64(seed))
+        num_out = self._sample_numerics(rng, n)
+        codes = self._sample_categoricals(rng, n)
         
-        return pd.DataFrame(synthetic_data)
+        if as_array:
+            return num_out, codes
+        
+        num_df = pd.DataFrame(num_out, columns=self._num_cols, copy=False)
+        if as_category:
+            cat_data = {
+                col: pd.Categorical.from_codes(codes[:, j], categories=values)
+                for j, (col, values) in enumerate(zip(self._cat_cols, self._cat_values))
+            }
+        else:
+            cat_data = {col: values[codes[:, j]] for j, (col, values) in enumerate(zip(self._cat_cols, self._cat_values))}
+        cat_df = pd.DataFrame(cat_data, index=num_df.index, columns=self._cat_cols)
+        return pd.concat([num_df, cat_df], axis=1, copy=False)[self.columns]
+    
+    def sample_counts(self, n: int, seed: Optional[int] = None) -> dict:
+        """
+        Category counts of n synthetic rows, as `{col: {value: count}}`.
+        
+        Draws the counts directly from a multinomial (a chain of binomials,
+        one per category) instead of sampling n labels and tallying them,
+        so the cost depends on the number of categories, not on n.
+        """
+        rng = np.random.Generator(np.random.SFC64(seed))
+        counts = {}
+        for col, values in zip(self._cat_cols, self._cat_values):
+            # Renormalize in float64; multinomial rejects probabilities
+            # that sum to more than 1 after float32 rounding
+            p = np.asarray(self.stats[col]['probabilities'], dtype=np.float64)
+            counts[col] = dict(zip(values.tolist(), rng.multinomial(n, p / p.sum()).tolist()))
+        return counts
 
 
 def train_simple_generator(data_path: str, categorical_cols: list = None):
@@ -79,21 +230,13 @@ def train_simple_generator(data_path: str, categorical_cols: list = None):
     df = pd.read_csv(data_path, encoding='utf-8-sig')
     
     # Clean string columns for Windows compatibility
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].fillna('').astype(str)
-            df[col] = df[col].apply(lambda x: x.encode('ascii', 'ignore').decode('ascii') if isinstance(x, str) else str(x))
-            df[col] = df[col].str.strip()
-            df[col] = df[col].replace('', 'Unknown')
+    clean_ascii_columns(df)
     
     # Auto-detect categorical if not specified
     if categorical_cols is None:
-        categorical_cols = []
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                categorical_cols.append(col)
-            elif df[col].nunique() <= 20:  # Low cardinality
-                categorical_cols.append(col)
+        # Object columns plus low-cardinality ones, from one nunique() pass
+        low_card = (df.dtypes == 'object') | (df.nunique() <= 20)
+        categorical_cols = df.columns[low_card].tolist()
     
     generator = SimpleGenerator()
     generator.fit(df, categorical_cols)
@@ -108,7 +251,7 @@ def train_simple_generator(data_path: str, categorical_cols: list = None):
 
 def save_simple_model(model_data: dict, output_path: str = 'ctgan_model.joblib'):
     """Save the simple generator model."""
-    joblib.dump(model_data, output_path, protocol=4)
+    save_model(model_data, output_path, protocol=4)
     print(f"[OK] Simple generator model saved to {output_path}")
 
 
@@ -136,6 +279,10 @@ if __name__ == '__main__':
     print("\nGenerated synthetic data:")
     print(synthetic)
     
+    print("\nCategory counts for 10000 synthetic rows:")
+    for col, counts in generator.sample_counts(10000, seed=42).items():
+        print(f"  {col}: {counts}")
+    
     print("\nStatistics comparison:")
     print("Original mean:", test_data.select_dtypes(include=[np.number]).mean().to_dict())
     print("Synthetic mean:", synthetic.select_dtypes(include=[np.number]).mean().to_dict())
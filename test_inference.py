@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
 
 import argparse
+import codecs
 import sys
+import pandas as pd
 from inference import generate, get_model_info
+from fix_csv_encoding import to_arrow_table
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    """Write df as UTF-8 CSV with a BOM, using pyarrow's multi-threaded writer when possible."""
+    table = to_arrow_table(df)
+    if table is not None:
+        import pyarrow.csv as pacsv
+        
+        # Same encoding as pandas' utf-8-sig (BOM, then UTF-8), but pyarrow
+        # quotes the header and string cells and formats floats its own way
+        with open(path, 'wb') as f:
+            f.write(codecs.BOM_UTF8)
+            pacsv.write_csv(table, f)
+        return
+    
+    df.to_csv(path, index=False, encoding='utf-8-sig')
 
 
 def main():
@@ -57,7 +76,7 @@ def main():
         print(f"\nSummary Statistics:")
         print(synthetic_df.describe())
         
-        synthetic_df.to_csv(args.output, index=False, encoding='utf-8-sig')
+        write_csv(synthetic_df, args.output)
         print(f"\nSaved {len(synthetic_df)} rows to {args.output}")
         
         print("\nTest completed successfully!")
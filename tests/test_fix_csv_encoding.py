@@ -0,0 +1,21 @@
+import pandas as pd
+
+from fix_csv_encoding import fix_csv_encoding, read_csv_fast
+
+
+def test_timestamp_column_is_kept_as_text(tmp_path):
+    path = tmp_path / 'events.csv'
+    path.write_text(
+        'when,value\n'
+        '2024-03-05T11:30:00+02:00,1\n'
+        '2024-03-06T08:00:00-05:00,2\n',
+        encoding='utf-8'
+    )
+    
+    df = read_csv_fast(str(path), 'utf-8-sig')
+    assert df['when'].tolist() == ['2024-03-05T11:30:00+02:00', '2024-03-06T08:00:00-05:00']
+    
+    assert fix_csv_encoding(str(path))
+    fixed = pd.read_csv(path, encoding='utf-8-sig')
+    assert fixed['when'].tolist() == ['2024-03-05T11:30:00+02:00', '2024-03-06T08:00:00-05:00']
+    assert fixed['value'].tolist() == [1, 2]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import simple_generator
+from simple_generator import SimpleGenerator, _cat_sample_numpy, _cdf
+
+
+@pytest.mark.skipif(not simple_generator.NUMBA_AVAILABLE, reason="numba not installed")
+def test_numba_kernel_matches_numpy():
+    rng = np.random.default_rng(0)
+    sizes = np.array([1, 2, 5, 9])
+    cdfs = [_cdf(rng.random(size)) + j for j, size in enumerate(sizes)]
+    cdf_flat = np.concatenate(cdfs)
+    ends = np.cumsum(sizes) - 1
+    starts = ends - sizes + 1
+    
+    U = rng.random((1000, len(sizes)))
+    # Edges of [0, 1): the smallest draw and one just below 1
+    U[0] = 0.0
+    U[1] = np.nextafter(1.0, 0.0)
+    
+    out = np.empty(U.shape, dtype=np.int8, order='F')
+    simple_generator._cat_sample_numba(cdf_flat, starts, ends, U, out)
+    np.testing.assert_array_equal(out, _cat_sample_numpy(cdf_flat, starts, ends, U))
+
+
+def test_large_magnitude_column_keeps_its_spread():
+    # Unix timestamps: float32 values near 1.7e9 are 128 apart, far more
+    # than the spread of the column
+    rng = np.random.default_rng(0)
+    real = pd.DataFrame({'ts': 1.7e9 + rng.normal(0, 30, 5000)})
+    
+    generator = SimpleGenerator()
+    generator.fit(real)
+    synthetic = generator.sample(100_000, seed=1)['ts']
+    
+    assert synthetic.min() >= real['ts'].min()
+    assert synthetic.max() <= real['ts'].max()
+    assert synthetic.std() == pytest.approx(real['ts'].std(), rel=0.05)
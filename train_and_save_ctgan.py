@@ -3,21 +3,22 @@
 import argparse
 import sys
 import warnings
-import pandas as pd
-import joblib
 import numpy as np
-
-warnings.filterwarnings('ignore')
+from fix_csv_encoding import read_csv_fast
+from model_io import save_model
 
 
 def detect_categorical_columns(df, max_unique_ratio=0.3, max_unique_count=20):
     categorical_cols = []
     
-    for col in df.columns:
+    # Distinct counts for every column in one call
+    nunique = df.nunique()
+    
+    for col, n_unique in nunique.items():
         if df[col].dtype == 'object':
             categorical_cols.append(col)
-        elif df[col].nunique() <= max_unique_count or \
-             (df[col].nunique() / len(df)) <= max_unique_ratio:
+        elif n_unique <= max_unique_count or \
+             (n_unique / len(df)) <= max_unique_ratio:
             categorical_cols.append(col)
     
     return categorical_cols
@@ -41,7 +42,11 @@ def train_with_sdv(df, categorical_cols, epochs):
         verbose=True
     )
     
-    model.fit(df)
+    # The training libraries are noisy; silence them only while fitting so
+    # importers of this module (e.g. the server) keep their warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(df)
     return model
 
 
@@ -55,43 +60,23 @@ def train_with_ctgan(df, categorical_cols, epochs):
         verbose=True
     )
     
-    model.fit(df, discrete_columns=categorical_cols)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(df, discrete_columns=categorical_cols)
     return model
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Train CTGAN on CSV data with automatic fallback logic'
-    )
-    parser.add_argument(
-        '--data',
-        type=str,
-        default='toy_medical.csv',
-        help='Path to CSV file (default: toy_medical.csv)'
-    )
-    parser.add_argument(
-        '--epochs',
-        type=int,
-        default=100,
-        help='Number of training epochs (default: 100)'
-    )
-    parser.add_argument(
-        '--output',
-        type=str,
-        default='ctgan_model.joblib',
-        help='Path to save trained model (default: ctgan_model.joblib)'
-    )
-    parser.add_argument(
-        '--preview-samples',
-        type=int,
-        default=20,
-        help='Number of synthetic samples to generate for preview (default: 20)'
-    )
-    
-    args = parser.parse_args()
-    
-    print(f"\nLoading data from {args.data}...")
-    df = pd.read_csv(args.data, encoding='utf-8-sig')
+def train(data_path, epochs=100, output='ctgan_model.joblib', preview_samples=20, progress_cb=None):
+    """
+    Train a model on a CSV file and save it to `output`.
+    
+    Tries SDV, then the standalone ctgan package, then the simple
+    statistical generator. `progress_cb`, if given, is called with the
+    number of completed epochs (the CTGAN backends only report
+    completion). Returns the saved model dict.
+    """
+    print(f"\nLoading data from {data_path}...")
+    df = read_csv_fast(data_path, 'utf-8-sig')
     
     # Clean column names to remove special characters
     df.columns = [''.join(char if char.isalnum() or char == '_' else '_' for char in str(col)).strip('_') for col in df.columns]
@@ -116,23 +101,23 @@ def main():
     categorical_cols = detect_categorical_columns(df)
     print(f"\nDetected categorical columns: {categorical_cols}")
     
-    print(f"\nTraining CTGAN for {args.epochs} epochs...")
+    print(f"\nTraining CTGAN for {epochs} epochs...")
     model = None
     library_used = None
     
     try:
-        model = train_with_sdv(df, categorical_cols, args.epochs)
+        model = train_with_sdv(df, categorical_cols, epochs)
         library_used = 'sdv'
     except ImportError:
         print("\nSDV not installed, falling back to ctgan package...")
         try:
-            model = train_with_ctgan(df, categorical_cols, args.epochs)
+            model = train_with_ctgan(df, categorical_cols, epochs)
             library_used = 'ctgan'
         except ImportError:
             print("\nCTGAN libraries not available, using simple statistical generator...")
             print("   (Python 3.14+ detected - CTGAN not yet supported)")
             from simple_generator import train_simple_generator
-            model_data = train_simple_generator(args.data, categorical_cols)
+            model_data = train_simple_generator(data_path, categorical_cols)
             library_used = model_data['library']
             model = model_data['model']
             
@@ -140,25 +125,29 @@ def main():
             print("   Note: This uses statistical sampling, not deep learning")
             print("   For better quality, use Python 3.9-3.13 with CTGAN")
     
-    print(f"\nSaving model to {args.output}...")
+    if progress_cb is not None:
+        progress_cb(epochs)
+    
+    print(f"\nSaving model to {output}...")
     model_data = {
         'model': model,
         'library': library_used,
         'categorical_columns': categorical_cols,
         'columns': list(df.columns)
     }
-    # Use protocol 4 for better cross-platform compatibility
-    joblib.dump(model_data, args.output, protocol=4)
+    # Use protocol 4 for better cross-platform compatibility; save_model
+    # swaps the file in atomically since the server may have it mapped
+    save_model(model_data, output, protocol=4)
     print("   [OK] Model saved successfully")
     
-    print(f"\nGenerating {args.preview_samples} synthetic samples for preview...")
+    print(f"\nGenerating {preview_samples} synthetic samples for preview...")
     try:
         if library_used == 'sdv':
-            synthetic_preview = model.sample(num_rows=args.preview_samples)
+            synthetic_preview = model.sample(num_rows=preview_samples)
         elif library_used == 'simple-statistical':
-            synthetic_preview = model.sample(args.preview_samples)
+            synthetic_preview = model.sample(preview_samples)
         else:
-            synthetic_preview = model.sample(args.preview_samples)
+            synthetic_preview = model.sample(preview_samples)
         
         preview_path = 'sample_synthetic_preview.csv'
         synthetic_preview.to_csv(preview_path, index=False, encoding='utf-8-sig')
@@ -172,10 +161,51 @@ def main():
     print("\nTraining complete!")
     print(f"\nSummary:")
     print(f"   - Library used: {library_used}")
-    print(f"   - Model saved: {args.output}")
+    print(f"   - Model saved: {output}")
     print(f"   - Training samples: {len(df)}")
-    print(f"   - Epochs: {args.epochs if library_used != 'simple-statistical' else 'N/A'}")
+    print(f"   - Epochs: {epochs if library_used != 'simple-statistical' else 'N/A'}")
     print(f"   - Categorical columns: {categorical_cols}")
+    
+    return model_data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train CTGAN on CSV data with automatic fallback logic'
+    )
+    parser.add_argument(
+        '--data',
+        type=str,
+        default='toy_medical.csv',
+        help='Path to CSV file (default: toy_medical.csv)'
+    )
+    parser.add_argument(
+        '--epochs',
+        type=int,
+        default=100,
+        help='Number of training epochs (default: 100)'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default='ctgan_model.joblib',
+        help='Path to save trained model (default: ctgan_model.joblib)'
+    )
+    parser.add_argument(
+        '--preview-samples',
+        type=int,
+        default=20,
+        help='Number of synthetic samples to generate for preview (default: 20)'
+    )
+    
+    args = parser.parse_args()
+    
+    train(
+        data_path=args.data,
+        epochs=args.epochs,
+        output=args.output,
+        preview_samples=args.preview_samples
+    )
 
 
 if __name__ == '__main__':